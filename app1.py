@@ -1,9 +1,17 @@
 # app1.py
 # Streamlit app with Supabase PostgreSQL backend using Streamlit Secrets
 
+import csv
+import hashlib
+import hmac
+import io
+
 import streamlit as st
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, func
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, func, select, literal, Index, update, insert, CheckConstraint, bindparam
+from sqlalchemy import text as sql_text
+from sqlalchemy.exc import ProgrammingError
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import NullPool
 from datetime import datetime
 
 # =========================
@@ -24,9 +32,24 @@ except KeyError:
     st.error("❌ Secrets not configured properly. Please set up .streamlit/secrets.toml")
     st.stop()
 
+@st.cache_resource
+def admin_password_hash():
+    """Hash the configured admin password once per process."""
+    return hashlib.sha256(ADMIN_PASSWORD.encode()).digest()
+
+def check_admin_password(candidate):
+    """Compare against the stored hash in constant time - no early exit on
+    the first differing character and no plaintext string comparison."""
+    candidate_hash = hashlib.sha256(candidate.encode()).digest()
+    return hmac.compare_digest(candidate_hash, admin_password_hash())
+
 ALLOWED_CATEGORIES = {"Religion", "Language", "Gender", "Conspiracy"}
 ALLOWED_PLATFORMS = {"X", "Reddit"}
 
+# Sorted once here instead of on every rerun in the form.
+CATEGORY_OPTIONS = tuple(sorted(ALLOWED_CATEGORIES))
+PLATFORM_OPTIONS = tuple(sorted(ALLOWED_PLATFORMS))
+
 # =========================
 # DATABASE MODEL
 # =========================
@@ -35,6 +58,22 @@ Base = declarative_base()
 
 class Submission(Base):
     __tablename__ = "submissions"
+    # Allowed values enforced by the database itself, so bad rows can't get
+    # in through any client - the UI selectboxes are just the friendly layer.
+    __table_args__ = (
+        CheckConstraint(
+            "category IN ('Conspiracy', 'Gender', 'Language', 'Religion')",
+            name="ck_submissions_category",
+        ),
+        CheckConstraint(
+            "platform IN ('X', 'Reddit')",
+            name="ck_submissions_platform",
+        ),
+        CheckConstraint(
+            "status IN ('pending', 'approved', 'rejected')",
+            name="ck_submissions_status",
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     text = Column(Text, nullable=False)
@@ -43,34 +82,244 @@ class Submission(Base):
     platform = Column(String, nullable=False)
     context = Column(Text)
     status = Column(String, default="pending")
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, server_default=func.now())
+
+# Serves both the admin "pending, newest first" query and the status-filtered
+# counts without a full scan.
+Index("ix_submissions_status_timestamp", Submission.status, Submission.timestamp.desc())
+
+# The latest-submissions list orders by timestamp alone, which the composite
+# index (leading on status) can't serve.
+Index("ix_submissions_timestamp", Submission.timestamp.desc())
+
+# Pending rows are a small, shrinking slice of the table; a partial index
+# keeps the admin review lookup tiny no matter how large the archive grows.
+Index(
+    "ix_submissions_pending_timestamp",
+    Submission.timestamp.desc(),
+    postgresql_where=(Submission.status == "pending"),
+)
+
+# =========================
+# PREBUILT STATEMENTS
+# =========================
+# Built once at import so reruns reuse the same Select objects (and their
+# entries in SQLAlchemy's compiled-SQL cache) instead of reconstructing the
+# expression trees on every page render.
+
+STATS_FALLBACK_STMT = (
+    select(literal("status").label("kind"), Submission.status.label("value"), func.count())
+    .group_by(Submission.status)
+    .union_all(
+        select(literal("category"), Submission.category, func.count())
+        .group_by(Submission.category)
+    )
+)
+
+LATEST_STMT = (
+    select(
+        Submission.category,
+        Submission.platform,
+        Submission.status,
+        func.substr(Submission.anonymized_text, 1, 200).label("preview"),
+        (func.length(Submission.anonymized_text) > 200).label("truncated"),
+        Submission.context,
+        Submission.timestamp,
+    )
+    .order_by(Submission.timestamp.desc())
+    .limit(bindparam("limit"))
+)
+
+PENDING_STMT = (
+    select(Submission.id, Submission.category, Submission.text)
+    .where(Submission.status == "pending")
+    .order_by(Submission.timestamp.desc())
+    .limit(5)
+)
+
+APPROVED_COUNT_STMT = (
+    select(func.count())
+    .select_from(Submission)
+    .where(Submission.status == "approved")
+)
+
+EXPORT_STMT = (
+    select(
+        Submission.anonymized_text,
+        Submission.category,
+        Submission.platform,
+        Submission.timestamp,
+    )
+    .where(Submission.status == "approved")
+    .execution_options(yield_per=1000)
+)
 
 # =========================
 # DATABASE SESSION
 # =========================
 
+def _uses_external_pooler(url):
+    """True when connecting through Supabase's pgBouncer (transaction mode)."""
+    return "pooler.supabase.com" in url or ":6543/" in url
+
 @st.cache_resource
 def get_engine():
     """Create database engine (cached)"""
     try:
-        engine = create_engine(
-            DATABASE_URL,
-            pool_pre_ping=True,
-            pool_recycle=3600,
-            echo=False  # Set to True for SQL debugging
-        )
-        # Create tables if they don't exist
-        Base.metadata.create_all(bind=engine)
-        return engine
+        engine_kwargs = {
+            "pool_pre_ping": True,
+            "echo": False,  # Set to True for SQL debugging
+        }
+        if _uses_external_pooler(DATABASE_URL):
+            # pgBouncer already multiplexes server connections; a client-side
+            # QueuePool on top just pins pooler slots, so disable it.
+            engine_kwargs["poolclass"] = NullPool
+        else:
+            engine_kwargs.update(pool_size=10, max_overflow=20, pool_recycle=1800)
+        # Cap any single statement at 5s so a runaway query can't hang a
+        # render; both drivers pass this through as a libpq startup option.
+        connect_args = {"options": "-c statement_timeout=5000"}
+        if DATABASE_URL.startswith("postgresql+psycopg:"):
+            # psycopg 3 prepares statements after a few executions, which
+            # transaction-mode pgBouncer can't route; psycopg2 never prepares.
+            connect_args["prepare_threshold"] = None
+        engine_kwargs["connect_args"] = connect_args
+        # Schema setup (tables, indexes, stats view) lives in
+        # create_database.init_db - run it once at deploy time. Issuing
+        # metadata.create_all here added catalog lookups to app startup and
+        # needs DDL rights the app role shouldn't hold.
+        return create_engine(DATABASE_URL, **engine_kwargs)
     except Exception as e:
         st.error(f"Failed to connect to database: {e}")
         st.stop()
 
-def get_session():
-    """Get a new database session"""
-    engine = get_engine()
-    SessionLocal = sessionmaker(bind=engine)
-    return SessionLocal()
+@st.cache_resource
+def get_sessionmaker():
+    """Build the session factory once per process; sessions themselves stay
+    short-lived, one per logical unit of work."""
+    return sessionmaker(bind=get_engine(), expire_on_commit=False)
+
+# =========================
+# CACHED QUERIES
+# =========================
+# Streamlit reruns the whole script on every widget interaction, so the
+# read-only dashboard queries are cached for a short TTL and explicitly
+# cleared after writes (submit / approve / reject).
+
+@st.cache_data(ttl=30)
+def load_stats():
+    """Load dashboard counts in a single round-trip, returned as plain dicts."""
+    with get_sessionmaker()() as session:
+        # Fast path: precomputed counts from the materialized view, refreshed
+        # after each write (see refresh_stats_view).
+        rows = None
+        try:
+            rows = session.execute(
+                sql_text("SELECT kind, value, n FROM submission_stats")
+            ).all()
+        except Exception:
+            # View not created yet; aggregate live below.
+            session.rollback()
+
+        status_counts = {}
+        category_counts = {}
+
+        if rows is not None:
+            for kind, value, count in rows:
+                (status_counts if kind == "status" else category_counts)[value] = count
+            return {
+                "total": sum(status_counts.values()),
+                "status": status_counts,
+                "category": category_counts,
+            }
+
+        # Fallback: status and category counts in a single round-trip instead
+        # of one SELECT (and one table scan) per metric.
+        for kind, value, count in session.execute(STATS_FALLBACK_STMT):
+            (status_counts if kind == "status" else category_counts)[value] = count
+
+        return {
+            "total": sum(status_counts.values()),
+            "status": status_counts,
+            "category": category_counts,
+        }
+
+@st.cache_data(ttl=30)
+def load_latest(limit):
+    """Load the most recent submissions as plain dicts (ORM instances are
+    bound to their session and can't be cached across reruns)."""
+    with get_sessionmaker()() as session:
+        # Only the displayed columns - skips pulling the raw text and the
+        # ORM identity-map/unit-of-work bookkeeping for each row. The text
+        # preview is truncated server-side so long entries never cross the
+        # wire (or sit in the cache) in full.
+        rows = session.execute(LATEST_STMT, {"limit": limit})
+        return [dict(row._mapping) for row in rows]
+
+def refresh_stats_view():
+    """Rebuild the precomputed dashboard counts after a write. CONCURRENTLY
+    (backed by the view's unique index, and run on an autocommit connection
+    since it can't execute inside a transaction) so dashboard reads never
+    block on the re-aggregation."""
+    try:
+        with get_engine().connect() as conn:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            # The refresh re-aggregates the whole table and may legitimately
+            # outlive the 5s cap the engine sets for UI reads; lift it for
+            # this maintenance statement.
+            conn.exec_driver_sql("SET statement_timeout = 0")
+            conn.exec_driver_sql(
+                "REFRESH MATERIALIZED VIEW CONCURRENTLY submission_stats"
+            )
+    except ProgrammingError as e:
+        if getattr(e.orig, "pgcode", None) == "42P01":  # undefined_table
+            # View not created yet - load_stats falls back to live aggregation.
+            return
+        st.warning(f"Could not refresh dashboard stats: {e}")
+    except Exception as e:
+        # Anything else (permissions, missing unique index, cancellation)
+        # leaves the dashboard serving stale counts - say so.
+        st.warning(f"Could not refresh dashboard stats: {e}")
+
+def clear_query_caches():
+    """Invalidate cached reads after a write so the dashboard reflects it."""
+    refresh_stats_view()
+    load_stats.clear()
+    load_latest.clear()
+
+def export_approved_csv():
+    """Write approved rows straight into a CSV buffer, streamed from the
+    server in batches so the full dataset is never held as ORM objects."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["text", "category", "platform", "timestamp"])
+    with get_sessionmaker()() as session:
+        for row in session.execute(EXPORT_STMT):
+            writer.writerow(row)
+    return buffer.getvalue()
+
+def add_submission(**values):
+    """Insert one submission with INSERT ... RETURNING - a single statement
+    and commit, no ORM flush or post-commit refresh round-trip."""
+    with get_sessionmaker()() as session:
+        new_id = session.execute(
+            insert(Submission).values(**values).returning(Submission.id)
+        ).scalar()
+        session.commit()
+    clear_query_caches()
+    return new_id
+
+def set_status(submission_ids, new_status):
+    """Flip submissions' status with a single UPDATE ... WHERE id IN (...) -
+    no SELECTs, no ORM objects to flush, one statement for the whole batch."""
+    with get_sessionmaker()() as session:
+        session.execute(
+            update(Submission)
+            .where(Submission.id.in_(submission_ids))
+            .values(status=new_status)
+        )
+        session.commit()
+    clear_query_caches()
 
 # =========================
 # UI
@@ -87,7 +336,11 @@ Data is stored securely in Supabase PostgreSQL database.
 
 # Connection status
 try:
-    session = get_session()
+    SessionLocal = get_sessionmaker()
+    # Engine construction is lazy, so actually touch the database - without
+    # this the banner would show success even when Supabase is unreachable.
+    with get_engine().connect() as conn:
+        conn.execute(sql_text("SELECT 1"))
     st.success("✅ Connected to Supabase")
 except Exception as e:
     st.error(f"❌ Database connection failed: {e}")
@@ -109,10 +362,10 @@ with st.form("submission_form", clear_on_submit=True):
     col1, col2 = st.columns(2)
     
     with col1:
-        category = st.selectbox("Category *", sorted(ALLOWED_CATEGORIES))
+        category = st.selectbox("Category *", CATEGORY_OPTIONS)
     
     with col2:
-        platform = st.selectbox("Source Platform *", sorted(ALLOWED_PLATFORMS))
+        platform = st.selectbox("Source Platform *", PLATFORM_OPTIONS)
     
     context = st.text_area(
         "Optional Context", 
@@ -127,7 +380,7 @@ if submitted:
         st.error("⚠️ Text content cannot be empty")
     else:
         try:
-            submission = Submission(
+            new_id = add_submission(
                 text=text.strip(),
                 anonymized_text=text.strip(),
                 category=category,
@@ -135,15 +388,10 @@ if submitted:
                 context=context.strip() if context else None,
                 status="pending"
             )
-            session.add(submission)
-            session.commit()
-            st.success("✅ Submission successfully stored in Supabase!")
+            st.success(f"✅ Submission #{new_id} successfully stored in Supabase!")
             st.balloons()
         except Exception as e:
-            session.rollback()
             st.error(f"❌ Error saving submission: {e}")
-        finally:
-            session.close()
 
 # =========================
 # DATASET STATISTICS
@@ -153,43 +401,32 @@ st.markdown("---")
 st.subheader("📊 Dataset Overview")
 
 try:
-    session = get_session()
-    
-    total = session.query(Submission).count()
-    pending = session.query(Submission).filter_by(status="pending").count()
-    approved = session.query(Submission).filter_by(status="approved").count()
-    rejected = session.query(Submission).filter_by(status="rejected").count()
-    
+    stats = load_stats()
+    status_counts = stats["status"]
+    category_counts = stats["category"]
+
     col1, col2, col3, col4 = st.columns(4)
-    
+
     with col1:
-        st.metric("Total", total, help="Total submissions in database")
+        st.metric("Total", stats["total"], help="Total submissions in database")
     with col2:
-        st.metric("Pending", pending, help="Awaiting review")
+        st.metric("Pending", status_counts.get("pending", 0), help="Awaiting review")
     with col3:
-        st.metric("Approved", approved, help="Approved for dataset")
+        st.metric("Approved", status_counts.get("approved", 0), help="Approved for dataset")
     with col4:
-        st.metric("Rejected", rejected, help="Rejected submissions")
-    
+        st.metric("Rejected", status_counts.get("rejected", 0), help="Rejected submissions")
+
     # Category breakdown
     st.markdown("### By Category")
-    
-    category_stats = (
-        session.query(Submission.category, func.count(Submission.id))
-        .group_by(Submission.category)
-        .all()
-    )
-    
-    if category_stats:
+
+    if category_counts:
         col1, col2, col3, col4 = st.columns(4)
         cols = [col1, col2, col3, col4]
-        
-        for idx, (cat, count) in enumerate(category_stats):
+
+        for idx, (cat, count) in enumerate(sorted(category_counts.items())):
             with cols[idx % 4]:
                 st.metric(cat, count)
-    
-    session.close()
-    
+
 except Exception as e:
     st.error(f"Error fetching statistics: {e}")
 
@@ -201,33 +438,24 @@ st.markdown("---")
 st.subheader("🕒 Latest Submissions")
 
 try:
-    session = get_session()
-    
-    latest = (
-        session.query(Submission)
-        .order_by(Submission.timestamp.desc())
-        .limit(10)
-        .all()
-    )
-    
+    latest = load_latest(10)
+
     if not latest:
         st.info("No submissions yet. Be the first to contribute!")
     else:
         for s in latest:
             with st.expander(
-                f"[{s.category}] from {s.platform} - {s.status.upper()}"
+                f"[{s['category']}] from {s['platform']} - {s['status'].upper()}"
             ):
                 st.write("**Content:**")
-                st.text(s.anonymized_text[:200] + "..." if len(s.anonymized_text) > 200 else s.anonymized_text)
-                
-                if s.context:
+                st.text(s["preview"] + "..." if s["truncated"] else s["preview"])
+
+                if s["context"]:
                     st.write("**Context:**")
-                    st.caption(s.context)
-                
-                st.caption(f"Submitted: {s.timestamp.strftime('%Y-%m-%d %H:%M:%S')}")
-    
-    session.close()
-    
+                    st.caption(s["context"])
+
+                st.caption(f"Submitted: {s['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}")
+
 except Exception as e:
     st.error(f"Error loading submissions: {e}")
 
@@ -240,42 +468,38 @@ with st.sidebar:
     
     admin_password = st.text_input("Admin Password", type="password")
     
-    if admin_password == ADMIN_PASSWORD:
+    if admin_password and check_admin_password(admin_password):
         st.success("✅ Admin access granted")
         
         st.subheader("Review Submissions")
         
         try:
-            session = get_session()
-            pending_submissions = (
-                session.query(Submission)
-                .filter_by(status="pending")
-                .order_by(Submission.timestamp.desc())
-                .limit(5)
-                .all()
-            )
-            
+            session = SessionLocal()
+            pending_submissions = session.execute(PENDING_STMT).all()
+
             if pending_submissions:
+                selected_ids = []
                 for sub in pending_submissions:
                     with st.container():
-                        st.write(f"**ID: {sub.id}** - {sub.category}")
+                        if st.checkbox(
+                            f"**ID: {sub.id}** - {sub.category}",
+                            key=f"select_{sub.id}",
+                        ):
+                            selected_ids.append(sub.id)
                         st.caption(sub.text[:100] + "...")
-                        
-                        col1, col2 = st.columns(2)
-                        
-                        if col1.button("✅ Approve", key=f"approve_{sub.id}"):
-                            sub.status = "approved"
-                            session.commit()
-                            st.success("Approved!")
-                            st.rerun()
-                        
-                        if col2.button("❌ Reject", key=f"reject_{sub.id}"):
-                            sub.status = "rejected"
-                            session.commit()
-                            st.warning("Rejected")
-                            st.rerun()
-                        
                         st.markdown("---")
+
+                col1, col2 = st.columns(2)
+
+                if col1.button("✅ Approve selected", disabled=not selected_ids):
+                    set_status(selected_ids, "approved")
+                    st.success(f"Approved {len(selected_ids)} submission(s)")
+                    st.rerun()
+
+                if col2.button("❌ Reject selected", disabled=not selected_ids):
+                    set_status(selected_ids, "rejected")
+                    st.warning(f"Rejected {len(selected_ids)} submission(s)")
+                    st.rerun()
             else:
                 st.info("No pending submissions")
             
@@ -283,25 +507,15 @@ with st.sidebar:
             st.markdown("---")
             st.subheader("📥 Export Dataset")
             
-            approved_count = session.query(Submission).filter_by(status="approved").count()
+            # Direct count(*) - Query.count() wraps the SELECT in a subquery,
+            # which blocks index-only scans on Postgres.
+            approved_count = session.execute(APPROVED_COUNT_STMT).scalar()
             st.write(f"Approved entries: **{approved_count}**")
             
             if st.button("Download CSV", use_container_width=True):
-                import pandas as pd
-                
-                approved = session.query(Submission).filter_by(status="approved").all()
-                
-                df = pd.DataFrame([{
-                    'text': s.anonymized_text,
-                    'category': s.category,
-                    'platform': s.platform,
-                    'timestamp': s.timestamp
-                } for s in approved])
-                
-                csv = df.to_csv(index=False)
                 st.download_button(
                     label="Download Dataset",
-                    data=csv,
+                    data=export_approved_csv(),
                     file_name=f"hate_speech_dataset_{datetime.now().strftime('%Y%m%d')}.csv",
                     mime="text/csv"
                 )
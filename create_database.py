@@ -1,9 +1,8 @@
 # create_database.py
 # Supabase PostgreSQL database setup
 
-from sqlalchemy import Column, Integer, String, DateTime, Text, create_engine
+from sqlalchemy import Column, Integer, String, DateTime, Text, create_engine, Index, CheckConstraint, func
 from sqlalchemy.orm import declarative_base
-from datetime import datetime
 import os
 
 # =========================
@@ -15,7 +14,7 @@ DATABASE_URL = os.getenv("SUPABASE_DB_URL")
 if not DATABASE_URL:
     raise RuntimeError("SUPABASE_DB_URL not set")
 
-ALLOWED_CATEGORIES = {"religion", "language", "gender", "conspiracy"}
+ALLOWED_CATEGORIES = {"Religion", "Language", "Gender", "Conspiracy"}
 ALLOWED_PLATFORMS = {"X", "Reddit"}
 ALLOWED_STATUS = {"pending", "approved", "rejected"}
 
@@ -27,6 +26,22 @@ Base = declarative_base()
 
 class Submission(Base):
     __tablename__ = "submissions"
+    # Allowed values enforced by the database itself, so bad rows can't get
+    # in through any client - the UI selectboxes are just the friendly layer.
+    __table_args__ = (
+        CheckConstraint(
+            "category IN ('Conspiracy', 'Gender', 'Language', 'Religion')",
+            name="ck_submissions_category",
+        ),
+        CheckConstraint(
+            "platform IN ('X', 'Reddit')",
+            name="ck_submissions_platform",
+        ),
+        CheckConstraint(
+            "status IN ('pending', 'approved', 'rejected')",
+            name="ck_submissions_status",
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     text = Column(Text, nullable=False)
@@ -35,14 +50,55 @@ class Submission(Base):
     platform = Column(String, nullable=False)
     context = Column(Text)
     status = Column(String, default="pending")
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, server_default=func.now())
+
+# Serves both the admin "pending, newest first" query and the status-filtered
+# counts without a full scan.
+Index("ix_submissions_status_timestamp", Submission.status, Submission.timestamp.desc())
+
+# The latest-submissions list orders by timestamp alone, which the composite
+# index (leading on status) can't serve.
+Index("ix_submissions_timestamp", Submission.timestamp.desc())
+
+# Pending rows are a small, shrinking slice of the table; a partial index
+# keeps the admin review lookup tiny no matter how large the archive grows.
+Index(
+    "ix_submissions_pending_timestamp",
+    Submission.timestamp.desc(),
+    postgresql_where=(Submission.status == "pending"),
+)
 
 # =========================
 # INIT DB
 # =========================
 
+# Precomputed dashboard counts; the app refreshes this after each write and
+# reads it instead of aggregating the submissions table per page render.
+STATS_VIEW_DDL = """
+CREATE MATERIALIZED VIEW IF NOT EXISTS submission_stats AS
+SELECT 'status' AS kind, status AS value, count(*) AS n
+FROM submissions GROUP BY status
+UNION ALL
+SELECT 'category' AS kind, category AS value, count(*) AS n
+FROM submissions GROUP BY category
+"""
+
+# REFRESH MATERIALIZED VIEW CONCURRENTLY (used by the app after writes)
+# requires a unique index on the view.
+STATS_VIEW_INDEX_DDL = """
+CREATE UNIQUE INDEX IF NOT EXISTS ux_submission_stats_kind_value
+ON submission_stats (kind, value)
+"""
+
 def init_db():
     engine = create_engine(DATABASE_URL)
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(STATS_VIEW_DDL)
+        conn.exec_driver_sql(STATS_VIEW_INDEX_DDL)
     return engine
 
+if __name__ == "__main__":
+    init_db()
+    print("Database schema created")
+